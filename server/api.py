@@ -1,14 +1,20 @@
 import os
+from functools import lru_cache
 from dotenv import load_dotenv
-from google import genai
 from filter import filter
 
 load_dotenv()
 
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+@lru_cache(maxsize=1)
+def get_client():
+    # Deferred so importing this module stays cheap and offline
+    from google import genai
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 
 
 def generate_content(prompt):
+    client = get_client()
     try:
         # Attempt to use the primary model (gemini-2.0-flash)
         response = client.models.generate_content(
@@ -1,8 +1,8 @@
 from flask import Flask, request, jsonify, make_response
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import timedelta
+from datetime import datetime, timedelta
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -10,24 +10,28 @@ load_dotenv()
 
 import os
 import json
-import yfinance as yf
-import requests
-from decimal import Decimal, ROUND_HALF_UP, getcontext
+import asyncio
 from sqlalchemy import and_
+import threading
+import time
 import traceback
+from functools import lru_cache
 from typing import Dict, Any, List, Tuple
-from bs4 import BeautifulSoup
-import pandas as pd
-import ollama  # Import the Ollama client
 
 # Import custom modules 
 from api import generate_content
+from helper_functions import run_io
+from jobs import JobQueue, JobLimitExceeded, PRIORITIES
+from upstream import budget
+from auth_cache import CachingJWTManager
+from market_data import CurrencyConversionError, get_info, to_inr_paise, get_current_price_paise, get_page
+from money import to_paise, from_paise, within_basis_points, portfolio_totals
 from prompts import personal_stocks, predictionPrompt, system_prompt
 from get_symbol import get_ticker
 from stock_analysis import analyze_stock
-
-# Set decimal precision
-getcontext().prec = 6
+from startup import prewarm, prewarm_enabled
+from serialization import json_response, compress_response
+from warmer import CacheWarmer
 
 # Load environment variables
 
@@ -35,30 +39,50 @@ getcontext().prec = 6
 # Initialize Flask app
 app = Flask(__name__)
 
+def engine_options(database_uri: str) -> Dict[str, Any]:
+    """Connection pool settings sized for concurrent async views.
+
+    pool_size + max_overflow defaults to ASGI_THREADS so every in-flight request can get a connection.
+    """
+    if not database_uri or database_uri.startswith('sqlite'):
+        return {}
+    pool_size = int(os.getenv('DB_POOL_SIZE', '20'))
+    max_overflow = max(0, int(os.getenv('ASGI_THREADS', '200')) - pool_size)
+    return {
+        "pool_size": pool_size,
+        "max_overflow": int(os.getenv('DB_MAX_OVERFLOW', str(max_overflow))),
+        "pool_timeout": int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        "pool_pre_ping": True,
+    }
+
 # Configuration
 app.config.update(
     SQLALCHEMY_DATABASE_URI=os.getenv('DATABASE_URI'),
+    SQLALCHEMY_ENGINE_OPTIONS=engine_options(os.getenv('DATABASE_URI')),
     SQLALCHEMY_TRACK_MODIFICATIONS=False,
     JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY'),
     JWT_TOKEN_LOCATION=['cookies'],
     JWT_COOKIE_SECURE=False,  # Set to True in production
     JWT_COOKIE_SAMESITE='Lax',
     JWT_ACCESS_COOKIE_NAME='access_token',
-    JWT_COOKIE_CSRF_PROTECT=False
+    JWT_COOKIE_CSRF_PROTECT=False,
+    # Werkzeug hash method, e.g. "scrypt" or "pbkdf2:sha256:600000". Benchmark with `python bench.py auth`.
+    PASSWORD_HASH_METHOD=os.getenv('PASSWORD_HASH_METHOD', 'scrypt'),
 )
 
 # Initialize extensions
 db = SQLAlchemy(app)
-jwt = JWTManager(app)
+jwt = CachingJWTManager(app, ttl=int(os.getenv('JWT_CLAIMS_CACHE_TTL', '300')))
 CORS(app, supports_credentials=True, resources={r"/*": {"origins": "http://localhost:3000"}})
+app.after_request(compress_response)
 
 # Models
 class UserDetails(db.Model):
     __tablename__ = 'user_details'
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(150), nullable=False)
-    email = db.Column(db.String(150), unique=True, nullable=False)
-    username = db.Column(db.String(150), unique=True, nullable=False)
+    email = db.Column(db.String(150), unique=True, index=True, nullable=False)
+    username = db.Column(db.String(150), unique=True, index=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
 
 class UserStocks(db.Model):
@@ -68,38 +92,123 @@ class UserStocks(db.Model):
     stock_name = db.Column(db.String(150), nullable=False)
     stock_symbol = db.Column(db.String(50), nullable=False)
     quantity = db.Column(db.Integer, default=1, nullable=False)
-    purchase_price = db.Column(db.Float, nullable=False)
+    purchase_price_paise = db.Column(db.BigInteger, nullable=False)  # INR, see money.py
+
+class StockPredictions(db.Model):
+    __tablename__ = 'stock_predictions'
+    stock_symbol = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, default=0, nullable=False)
+    last_predicted = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
 # Utility functions
-def get_stock_price_in_inr(symbol: str, use_current_price: bool, user_price: float = None) -> Tuple[Decimal, str]:
-    """Fetch stock price and convert to INR if necessary."""
-    stock = yf.Ticker(symbol)
-    info = stock.info
+def get_stock_price_in_inr(symbol: str, use_current_price: bool, user_price: float = None) -> Tuple[int, str]:
+    """Fetch stock price in INR paise, converting currency if necessary."""
+    info = get_info(symbol)
 
     if use_current_price:
-        price = Decimal(str(info['regularMarketPrice']))
-        currency = info['currency']
-        if currency != "INR":
-            response = requests.get(f"https://api.frankfurter.app/latest?amount={price}&from={currency}&to=INR")
-            fx_data = response.json()
-            if 'rates' not in fx_data:
-                raise ValueError("Currency conversion failed")
-            price = Decimal(str(fx_data['rates']['INR'])).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        price = to_inr_paise(info['regularMarketPrice'], info['currency'])
     else:
         if user_price is None:
             raise ValueError("Purchase price required when currentPrice is False")
-        price = Decimal(str(user_price))
+        price = to_paise(user_price)
 
     return price, info['shortName']
 
+def hash_password(password: str) -> str:
+    """Hash a password with the configured method and cost."""
+    return generate_password_hash(password, method=app.config['PASSWORD_HASH_METHOD'])
+
+@lru_cache(maxsize=None)
+def hash_prefix(method: str) -> str:
+    """Normalized method prefix werkzeug writes for `method`, e.g. "scrypt:32768:8:1"."""
+    return generate_password_hash("", method=method).split('$', 1)[0]
+
+def needs_rehash(stored_hash: str) -> bool:
+    """True when a stored hash was made with a different method or cost than configured."""
+    return stored_hash.split('$', 1)[0] != hash_prefix(app.config['PASSWORD_HASH_METHOD'])
+
 def handle_error(e: Exception, message: str = "Something went wrong") -> Dict[str, Any]:
     """Standardize error response."""
     traceback.print_exc()
     return {"error": message, "details": str(e)}
 
+def run_personal_stocks(amount: str, term: str, risk: str, frequency: str) -> Dict[str, Any]:
+    """Generate personalized stock recommendations with Gemini."""
+    prompt = personal_stocks(amount, term, risk, frequency)
+    return json.loads(generate_content(prompt))
+
+def run_prediction(company: str) -> Dict[str, Any]:
+    """Analyze a company and ask Gemini for a prediction."""
+    stock_data = analyze_stock(company)
+    record_prediction(stock_data['stock_name'])
+    prompt = predictionPrompt(stock_data)
+    result = json.loads(generate_content(prompt))
+    return {"result": result, "raw_data": stock_data}
+
+def record_prediction(symbol: str) -> None:
+    """Count a prediction so the cache warmer can prioritize popular tickers."""
+    with app.app_context():
+        try:
+            row = db.session.get(StockPredictions, symbol)
+            if row:
+                row.count += 1
+                row.last_predicted = datetime.utcnow()
+            else:
+                db.session.add(StockPredictions(stock_symbol=symbol, count=1))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            traceback.print_exc()
+
+def warm_targets() -> List[str]:
+    """Distinct held tickers followed by the most predicted ones."""
+    with app.app_context():
+        held = [row[0] for row in db.session.query(UserStocks.stock_symbol).distinct()]
+        predicted = [row[0] for row in db.session.query(StockPredictions.stock_symbol)
+                     .order_by(StockPredictions.count.desc())
+                     .limit(int(os.getenv('WARM_TOP_PREDICTED', '20')))]
+    return list(dict.fromkeys(held + predicted))
+
+def submit_job(kind: str, params: Dict[str, Any], data: Dict[str, Any]):
+    """Queue a long-running request and return its job ID."""
+    priority = data.get('priority', 'normal')
+    if not isinstance(priority, str) or priority not in PRIORITIES:
+        return jsonify({"error": f"'priority' must be one of: {', '.join(PRIORITIES)}"}), 400
+
+    try:
+        job = job_queue.submit(kind, params, int(get_jwt_identity()), priority)
+    except JobLimitExceeded as e:
+        return jsonify({"error": str(e)}), 429
+    return jsonify(job.to_dict()), 202
+
+def load_holdings(user_id: int) -> List[Any]:
+    """Read a user's holdings as plain rows and return the DB connection before any slow await."""
+    rows = db.session.query(
+        UserStocks.id, UserStocks.stock_name, UserStocks.stock_symbol,
+        UserStocks.quantity, UserStocks.purchase_price_paise
+    ).filter_by(user_id=user_id).all()
+    db.session.close()
+    return rows
+
+async def fetch_current_prices(stocks: List[Any]) -> Dict[str, int]:
+    """Fetch the current INR price in paise of each distinct ticker, concurrently."""
+    symbols = list(dict.fromkeys(stock.stock_symbol for stock in stocks))
+    prices = await asyncio.gather(*(run_io(get_current_price_paise, symbol) for symbol in symbols))
+    return dict(zip(symbols, prices))
+
+# Background jobs for /predict and /analysis
+JOB_POLL_INTERVAL = 0.25
+job_queue = JobQueue(
+    workers=int(os.getenv('JOB_WORKERS', '4')),
+    per_user_limit=int(os.getenv('JOB_USER_LIMIT', '3')),
+    retention=int(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+)
+job_queue.register('analysis', run_personal_stocks)
+job_queue.register('predict', run_prediction)
+
 # Routes
 @app.route('/bot', methods=['POST'])
-def bot():
+async def bot():
     """Handle chatbot requests using Ollama's LLaMA 3 model."""
     try:
         data = request.get_json()
@@ -122,8 +231,11 @@ def bot():
             "content": system_prompt
         })
 
+        import ollama  # Deferred heavy import, see startup.py
+
         # Call the Ollama API with LLaMA 3
-        response = ollama.chat(
+        response = await run_io(
+            ollama.chat,
             model='llama3',
             messages=conversation
         )
@@ -138,18 +250,19 @@ def bot():
 
 @app.route('/analysis', methods=['POST'])
 @jwt_required()
-def get_personal_stocks():
+async def get_personal_stocks():
     """Generate personalized stock recommendations."""
     data = request.get_json()
     amount = data.get('Amount', '100000')
     term = data.get('term', 'medium-term')
     risk = data.get('risk', 'medium')
     frequency = data.get('frequency', 'SIP')
-    
+
+    if data.get('async'):
+        return submit_job('analysis', {"amount": amount, "term": term, "risk": risk, "frequency": frequency}, data)
+
     try:
-        prompt = personal_stocks(amount, term, risk, frequency)
-        generated_json = generate_content(prompt)
-        return jsonify(json.loads(generated_json)), 200
+        return json_response(await run_io(run_personal_stocks, amount, term, risk, frequency)), 200
     except Exception as e:
         return jsonify(handle_error(e, "Failed to generate content")), 500
 
@@ -159,14 +272,17 @@ def register():
     data = request.get_json()
     required_fields = ["full_name", "username", "password", "email"]
     
-    if not all(data.get(field) for field in required_fields):
+    if not all(isinstance(data.get(field), str) and data.get(field) for field in required_fields):
         return jsonify({"msg": "All fields are required"}), 400
 
+    if '@' in data["username"]:
+        return jsonify({"msg": "Username cannot contain '@'"}), 400
+
     if UserDetails.query.filter_by(username=data["username"]).first():
         return jsonify({"msg": "Username already exists"}), 409
 
     try:
-        hashed_password = generate_password_hash(data["password"])
+        hashed_password = hash_password(data["password"])
         new_user = UserDetails(
             full_name=data["full_name"],
             username=data["username"],
@@ -187,10 +303,24 @@ def login():
     username = data.get("username")
     password = data.get("password")
 
-    user = UserDetails.query.filter_by(username=username).first()
+    if not isinstance(username, str) or not isinstance(password, str) or not username:
+        return jsonify({"msg": "Username and password are required"}), 400
+
+    # New usernames cannot contain '@', so the identifier's form picks the (indexed) column.
+    # Accounts created before that rule may still have one, hence the username fallback.
+    user = None
+    if '@' in username:
+        user = UserDetails.query.filter_by(email=username).first()
+    if not user:
+        user = UserDetails.query.filter_by(username=username).first()
     if not user or not check_password_hash(user.password, password):
         return jsonify({"msg": "Invalid username or password"}), 401
 
+    # Upgrade hashes made with a different method or cost
+    if needs_rehash(user.password):
+        user.password = hash_password(password)
+        db.session.commit()
+
     access_token = create_access_token(
         identity=str(user.id),
         additional_claims={"full_name": user.full_name, "email": user.email, "username": user.username},
@@ -210,12 +340,14 @@ def login():
 
 @app.route('/market-data-us', methods=['GET'])
 @jwt_required()
-def get_market_data_us():
+async def get_market_data_us():
     url = 'https://www.moneycontrol.com/us-markets'
-    response = requests.get(url)
-    html_content = response.text
+    html_content = await run_io(get_page, url)
 
     # Step 2: Parse HTML
+    from bs4 import BeautifulSoup  # Deferred heavy imports, see startup.py
+    import pandas as pd
+
     soup = BeautifulSoup(html_content, 'html.parser')
 
     # Step 3: Extract data
@@ -231,16 +363,18 @@ def get_market_data_us():
         json_table = df.to_dict(orient='records')  # Convert to list of dicts
         all_tables_json.append(json_table)
 
-    return jsonify(all_tables_json), 200
+    return json_response(all_tables_json), 200
 
 @app.route('/market-data-in', methods=['GET'])
 @jwt_required()
-def get_market_data_in():
+async def get_market_data_in():
     url = 'https://www.moneycontrol.com'
-    response = requests.get(url)
-    html_content = response.text
+    html_content = await run_io(get_page, url)
 
     # Step 2: Parse HTML
+    from bs4 import BeautifulSoup  # Deferred heavy imports, see startup.py
+    import pandas as pd
+
     soup = BeautifulSoup(html_content, 'html.parser')
 
     # Step 3: Extract data
@@ -256,11 +390,11 @@ def get_market_data_in():
         json_table = df.to_dict(orient='records')  # Convert to list of dicts
         all_tables_json.append(json_table)
 
-    return jsonify(all_tables_json), 200
+    return json_response(all_tables_json), 200
 
 @app.route('/add-stock', methods=['POST'])
 @jwt_required()
-def add_stock():
+async def add_stock():
     """Add a stock to user's portfolio."""
     try:
         data = request.get_json()
@@ -270,13 +404,13 @@ def add_stock():
         user_purchase_price = data.get("purchasePrice", None)
         user_id = int(get_jwt_identity())  # Use JWT identity
 
-        stock_symbol = get_ticker(stock_name)
-        price_inr, name = get_stock_price_in_inr(stock_symbol, current_price_flag, user_purchase_price)
+        stock_symbol = await run_io(get_ticker, stock_name)
+        price_inr, name = await run_io(get_stock_price_in_inr, stock_symbol, current_price_flag, user_purchase_price)
 
         existing_stocks = UserStocks.query.filter_by(user_id=user_id, stock_symbol=stock_symbol).all()
         for stock in existing_stocks:
-            old_price = Decimal(str(stock.purchase_price))
-            if abs(old_price - price_inr) / old_price * 100 <= Decimal("0.5"):
+            # Merge into a holding bought within 0.5% of this price
+            if within_basis_points(stock.purchase_price_paise, price_inr, 50):
                 stock.quantity += quantity
                 db.session.commit()
                 return jsonify({
@@ -284,7 +418,7 @@ def add_stock():
                     "stock_info": {
                         "name": name,
                         "symbol": stock_symbol,
-                        "price": float(price_inr),
+                        "price": from_paise(price_inr),
                         "currency": "INR"
                     }
                 }), 201
@@ -296,7 +430,7 @@ def add_stock():
             user_id=user_id,
             stock_name=final_name,
             stock_symbol=stock_symbol,
-            purchase_price=float(price_inr),
+            purchase_price_paise=price_inr,
             quantity=quantity
         )
         db.session.add(new_stock)
@@ -307,7 +441,7 @@ def add_stock():
             "stock_info": {
                 "name": name,
                 "symbol": stock_symbol,
-                "price": float(price_inr),
+                "price": from_paise(price_inr),
                 "currency": "INR"
             }
         }), 201
@@ -318,36 +452,61 @@ def add_stock():
 
 @app.route('/get-stocks', methods=['GET'])
 @jwt_required()
-def get_stocks():
+async def get_stocks():
     """Retrieve user's stock portfolio."""
     try:
         user_id = int(get_jwt_identity())  # Use JWT identity
-        stocks = UserStocks.query.filter_by(user_id=user_id).all()
+        stocks = load_holdings(user_id)
 
         if not stocks:
             return jsonify({"msg": "No stocks found"}), 404
 
+        try:
+            price_by_symbol = await fetch_current_prices(stocks)
+        except CurrencyConversionError as e:
+            return jsonify({"error": "Currency conversion failed", "details": e.details}), 400
+
         stock_list: List[Dict[str, Any]] = []
         for stock in stocks:
-            stock_yf = yf.Ticker(stock.stock_symbol)
-            price = Decimal(str(stock_yf.info['currentPrice']))
-            if stock_yf.info['currency'] != "INR":
-                response = requests.get(f"https://api.frankfurter.app/latest?amount={price}&from={stock_yf.info['currency']}&to=INR")
-                fx_data = response.json()
-                if 'rates' not in fx_data:
-                    return jsonify({"error": "Currency conversion failed", "details": fx_data}), 400
-                price = Decimal(str(fx_data['rates']['INR'])).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
+            price = price_by_symbol[stock.stock_symbol]
             stock_list.append({
                 "id": stock.id,
                 "name": stock.stock_name,
                 "ticker": stock.stock_symbol,
                 "quantity": stock.quantity,
-                "purchasePrice": float(stock.purchase_price),
-                "currentPrice": float(price),
+                "purchasePrice": from_paise(stock.purchase_price_paise),
+                "currentPrice": from_paise(price),
             })
 
-        return jsonify(stock_list), 200
+        return json_response(stock_list), 200
+
+    except Exception as e:
+        return jsonify(handle_error(e)), 500
+
+@app.route('/portfolio-summary', methods=['GET'])
+@jwt_required()
+async def get_portfolio_summary():
+    """Total invested value, current value and profit/loss of the user's portfolio in INR."""
+    try:
+        user_id = int(get_jwt_identity())  # Use JWT identity
+        stocks = load_holdings(user_id)
+
+        try:
+            price_by_symbol = await fetch_current_prices(stocks)
+        except CurrencyConversionError as e:
+            return jsonify({"error": "Currency conversion failed", "details": e.details}), 400
+
+        totals = portfolio_totals(
+            (stock.quantity for stock in stocks),
+            (stock.purchase_price_paise for stock in stocks),
+            (price_by_symbol[stock.stock_symbol] for stock in stocks)
+        )
+        return jsonify({
+            "invested": from_paise(totals["invested"]),
+            "currentValue": from_paise(totals["current"]),
+            "profitLoss": from_paise(totals["pnl"]),
+            "currency": "INR"
+        }), 200
 
     except Exception as e:
         return jsonify(handle_error(e)), 500
@@ -369,7 +528,7 @@ def edit_stock(stock_id: int):
         if new_quantity is not None:
             stock.quantity = int(new_quantity)
         if new_price is not None:
-            stock.purchase_price = float(new_price)
+            stock.purchase_price_paise = to_paise(new_price)
 
         db.session.commit()
         return jsonify({"msg": "Stock updated successfully"}), 200
@@ -398,7 +557,7 @@ def delete_stock(stock_id: int):
 
 @app.route('/predict', methods=['POST'])
 @jwt_required()
-def analyze():
+async def analyze():
     """Predict stock performance."""
     data = request.get_json()
     company = data.get('company', '')
@@ -406,14 +565,29 @@ def analyze():
     if not company:
         return jsonify({"error": "Missing 'company' field"}), 400
 
+    if data.get('async'):
+        return submit_job('predict', {"company": company}, data)
+
     try:
-        stock_data = analyze_stock(company)
-        prompt = predictionPrompt(stock_data)
-        result = json.loads(generate_content(prompt))
-        return jsonify({"result": result, "raw_data": stock_data}), 200
+        return json_response(await run_io(run_prediction, company)), 200
     except Exception as e:
         return jsonify(handle_error(e, "Failed to analyze stock")), 500
 
+@app.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+async def get_job(job_id: str):
+    """Poll a background job, optionally waiting up to `wait` seconds for it to finish."""
+    job = job_queue.get(job_id, int(get_jwt_identity()))
+    if not job:
+        return jsonify({"msg": "Job not found"}), 404
+
+    # Poll on the event loop so long-polls never hold a thread from the shared I/O pool
+    deadline = time.monotonic() + min(request.args.get('wait', 0, type=float), 30)
+    while job.active and time.monotonic() < deadline:
+        await asyncio.sleep(min(JOB_POLL_INTERVAL, deadline - time.monotonic()))
+
+    return json_response(job.to_dict()), 200
+
 @app.route('/protected', methods=['GET'])
 @jwt_required()
 def protected():
@@ -427,6 +601,11 @@ def protected():
         "email": claims.get("email"),
     }), 200
 
+@app.route('/metrics/upstream', methods=['GET'])
+def upstream_metrics():
+    """Expose remaining budget and circuit breaker state per data provider."""
+    return jsonify(budget.metrics()), 200
+
 @app.route('/logout', methods=['POST'])
 def logout():
     """Log out user by clearing JWT cookie."""
@@ -435,8 +614,33 @@ def logout():
     return response, 200
 
 # Initialize database
-with app.app_context():
-    db.create_all()
+_db_ready = False
+_db_lock = threading.Lock()
+
+def init_db():
+    """Create missing tables once per process."""
+    global _db_ready
+    with _db_lock:
+        if not _db_ready:
+            with app.app_context():
+                db.create_all()
+            _db_ready = True
+
+@app.before_request
+def ensure_db():
+    if not _db_ready:
+        init_db()
+
+if prewarm_enabled():
+    prewarm(init_db)
+
+cache_warmer = CacheWarmer(
+    warm_targets,
+    concurrency=int(os.getenv('WARM_CONCURRENCY', '4')),
+    reserve=float(os.getenv('WARM_RESERVE', '2')),
+    setup=init_db
+)
 
 if __name__ == '__main__':
+    init_db()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
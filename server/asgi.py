@@ -0,0 +1,17 @@
+"""ASGI entry point.
+
+Run with: uvicorn asgi:asgi_app --host 0.0.0.0 --port 5000
+"""
+import os
+from a2wsgi import WSGIMiddleware
+
+from app import app, cache_warmer
+from warmer import warmer_enabled
+
+# Each in-flight request holds one of these threads while its async view
+# awaits outbound I/O on the shared pool in helper_functions.
+asgi_app = WSGIMiddleware(app, workers=int(os.getenv('ASGI_THREADS', '200')))
+
+# Only safe with a single worker; see warmer.py for multi-worker setups
+if warmer_enabled():
+    cache_warmer.start()
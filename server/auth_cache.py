@@ -0,0 +1,33 @@
+import hashlib
+import time
+from typing import Optional
+
+from flask_jwt_extended import JWTManager
+
+from cache import TTLCache
+
+
+class CachingJWTManager(JWTManager):
+    """JWTManager that remembers decoded claims for recently seen tokens.
+
+    Every protected route decodes and verifies the access cookie. Tokens are
+    immutable, so the verified claims are cached under a hash of the token
+    until `ttl` seconds pass or the token's own `exp` is reached.
+    """
+
+    def __init__(self, app=None, ttl: float = 300, maxsize: int = 10000, **kwargs):
+        self.claims_cache: Optional[TTLCache] = TTLCache(ttl, maxsize=maxsize) if ttl > 0 else None
+        super().__init__(app, **kwargs)
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None, allow_expired: bool = False) -> dict:
+        if self.claims_cache is None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = hashlib.sha256(f"{encoded_token}|{csrf_value}".encode()).hexdigest()
+        claims = self.claims_cache.get(key)
+        if claims is not None and claims.get("exp", float("inf")) > time.time():
+            return dict(claims)
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        self.claims_cache.set(key, claims)
+        return dict(claims)
@@ -0,0 +1,299 @@
+"""Offline backtesting for the technical verdict rules in stock_analysis.py.
+
+Replays generate_technical_verdict on every trading day of locally stored
+daily history. Each day looks only at the trailing 20-bar window, exactly as
+analyze_stock does. It reports hit rate, average forward return and drawdown
+per verdict. It can also sweep the RSI and volatility thresholds across
+processes.
+
+Usage:
+    python backtest.py fetch AAPL TCS.NS --period 10y --data-dir data   # one-off download
+    python backtest.py run --data-dir data [--horizon 5]
+    python backtest.py sweep --data-dir data [--rsi-oversold 20,25,30,35] [--workers 8]
+
+`run` and `sweep` never touch the network. They read every <TICKER>.csv in
+--data-dir. Each file needs Date, Close and Volume columns, which is the layout
+of a yfinance history export.
+"""
+import argparse
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from glob import glob
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from stock_analysis import (
+    RSI_OVERSOLD, RSI_OVERBOUGHT, MAX_VOLATILITY, BULLISH_SCORE, BEARISH_SCORE
+)
+
+WINDOW = 20  # analyze_stock looks at the last 20 daily bars
+RSI_PERIOD = 14
+
+VERDICTS = [
+    "Buy - Oversold",
+    "Sell - Overbought",
+    "Caution - High Volatility",
+    "Buy - Strong Bullish Indicators",
+    "Sell - Strong Bearish Indicators",
+    "Hold - Mixed Signals",
+]
+# Position taken when a verdict fires; neutral verdicts are measured as long for comparison
+DIRECTIONS = np.array([1, -1, 1, 1, -1, 1])
+NEUTRAL = np.array([False, False, True, False, False, True])
+
+
+def load_history(data_dir: str) -> Dict[str, pd.DataFrame]:
+    """Read every <TICKER>.csv in `data_dir` into a Date-sorted frame of Close and Volume."""
+    frames = {}
+    for path in sorted(glob(os.path.join(data_dir, "*.csv"))):
+        df = pd.read_csv(path, usecols=["Date", "Close", "Volume"])
+        df["Date"] = pd.to_datetime(df["Date"], utc=True).dt.tz_localize(None).dt.normalize()
+        df = df.dropna().sort_values("Date").reset_index(drop=True)
+        if len(df) > WINDOW:
+            frames[os.path.splitext(os.path.basename(path))[0]] = df
+    return frames
+
+
+def _ema(windows: np.ndarray, span: int) -> np.ndarray:
+    """pandas ewm(span, adjust=False).mean() along axis 1."""
+    alpha = 2 / (span + 1)
+    out = np.empty_like(windows)
+    out[:, 0] = windows[:, 0]
+    for i in range(1, windows.shape[1]):
+        out[:, i] = alpha * windows[:, i] + (1 - alpha) * out[:, i - 1]
+    return out
+
+
+def window_indicators(close: np.ndarray, volume: np.ndarray) -> Dict[str, np.ndarray]:
+    """Compute analyze_stock's indicators for every trailing window at once.
+
+    Row i describes the window ending at bar i + WINDOW - 1.
+    """
+    from numpy.lib.stride_tricks import sliding_window_view
+
+    c = sliding_window_view(close, WINDOW)
+    v = sliding_window_view(volume, WINDOW)
+    current = c[:, -1]
+
+    delta = np.diff(c, axis=1)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    avg_gain = gain[:, :RSI_PERIOD].mean(axis=1)
+    avg_loss = loss[:, :RSI_PERIOD].mean(axis=1)
+    for i in range(RSI_PERIOD, delta.shape[1]):
+        avg_gain = (avg_gain * (RSI_PERIOD - 1) + gain[:, i]) / RSI_PERIOD
+        avg_loss = (avg_loss * (RSI_PERIOD - 1) + loss[:, i]) / RSI_PERIOD
+    rsi = 100 - 100 / (1 + avg_gain / (avg_loss + 1e-10))
+
+    macd = _ema(c, 12) - _ema(c, 26)
+    signal = _ema(macd, 9)
+
+    returns = c[:, 1:] / c[:, :-1] - 1
+    return {
+        "rsi": rsi,
+        "macd": macd[:, -1],
+        "signal": signal[:, -1],
+        "momentum": current - c[:, -11],
+        "price_trend": current - c[:, 0],
+        "volume_up": v[:, -1] > v[:, -5:].mean(axis=1),
+        "volatility": returns.std(axis=1, ddof=1) * 100 * np.sqrt(252),
+        "sma_5": c[:, -5:].mean(axis=1),
+        "sma_10": c[:, -10:].mean(axis=1),
+    }
+
+
+def build_dataset(frames: Dict[str, pd.DataFrame], horizon: int) -> Dict[str, np.ndarray]:
+    """Indicators, bullish score and forward returns for every (ticker, day), concatenated."""
+    parts: List[Dict[str, np.ndarray]] = []
+    for ticker, df in frames.items():
+        close = df["Close"].to_numpy(dtype=float)
+        ind = window_indicators(close, df["Volume"].to_numpy(dtype=float))
+        end = np.arange(WINDOW - 1, len(close))
+
+        # Forward returns are unknown for the last `horizon` days, so those rows are dropped
+        keep = end + horizon < len(close)
+        end = end[keep]
+        score = ((ind["rsi"] > 50).astype(np.int8) + (ind["macd"] > ind["signal"]) + (ind["momentum"] > 0)
+                 + ind["volume_up"] + (ind["sma_5"] > ind["sma_10"]) + (ind["price_trend"] > 0))
+        parts.append({
+            "date": df["Date"].to_numpy()[end],
+            "rsi": ind["rsi"][keep],
+            "volatility": ind["volatility"][keep],
+            "score": score[keep],
+            "forward": close[end + horizon] / close[end] - 1,
+            "next_day": close[end + 1] / close[end] - 1,
+            "ticker": np.full(len(end), ticker, dtype=object),
+        })
+    if not parts:
+        raise ValueError("No usable history files found")
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def technical_verdicts(rsi: np.ndarray, volatility: np.ndarray, score: np.ndarray,
+                       rsi_oversold: float = RSI_OVERSOLD, rsi_overbought: float = RSI_OVERBOUGHT,
+                       max_volatility: float = MAX_VOLATILITY) -> np.ndarray:
+    """Vectorised generate_technical_verdict; returns indexes into VERDICTS."""
+    return np.select(
+        [rsi < rsi_oversold, rsi > rsi_overbought, volatility > max_volatility,
+         score >= BULLISH_SCORE, score <= BEARISH_SCORE],
+        [0, 1, 2, 3, 4],
+        default=5,
+    )
+
+
+def max_drawdown(returns: np.ndarray) -> float:
+    if not len(returns):
+        return 0.0
+    equity = np.cumprod(1 + returns)
+    return float(np.max(1 - equity / np.maximum.accumulate(equity)))
+
+
+def rule_metrics(data: Dict[str, np.ndarray], verdicts: np.ndarray, hold_band: float) -> List[Dict[str, float]]:
+    """Per verdict: signal count, hit rate, mean forward return, compounded next-day return and drawdown.
+
+    A Buy hits when the forward return is positive, a Sell when it is negative,
+    and a neutral verdict when the move stays within `hold_band`. The equity
+    curve holds the verdict's position for one day after each signal,
+    equally weighted across tickers that fire on the same date.
+    """
+    rows = []
+    for index, verdict in enumerate(VERDICTS):
+        mask = verdicts == index
+        forward = data["forward"][mask]
+        direction = DIRECTIONS[index]
+        if NEUTRAL[index]:
+            hits = np.abs(forward) <= hold_band
+        else:
+            hits = direction * forward > 0
+
+        daily = pd.Series(direction * data["next_day"][mask]).groupby(data["date"][mask]).mean().to_numpy()
+        rows.append({
+            "verdict": verdict,
+            "signals": int(mask.sum()),
+            "hit_rate": float(hits.mean()) if mask.any() else float("nan"),
+            "mean_return": float((direction * forward).mean()) if mask.any() else float("nan"),
+            "total_return": float(np.prod(1 + daily) - 1),
+            "max_drawdown": max_drawdown(daily),
+        })
+    return rows
+
+
+# Sweep workers get the dataset once through the pool initializer instead of with every task
+_sweep_data: Dict[str, np.ndarray] = {}
+
+
+def _init_sweep(data: Dict[str, np.ndarray]) -> None:
+    global _sweep_data
+    _sweep_data = data
+
+
+def _evaluate(params: Sequence[float]) -> Dict[str, float]:
+    rsi_oversold, rsi_overbought, max_volatility = params
+    data = _sweep_data
+    verdicts = technical_verdicts(data["rsi"], data["volatility"], data["score"],
+                                  rsi_oversold, rsi_overbought, max_volatility)
+    direction = DIRECTIONS[verdicts] * ~NEUTRAL[verdicts]
+    active = direction != 0
+    signed = direction[active] * data["forward"][active]
+    return {
+        "rsi_oversold": rsi_oversold,
+        "rsi_overbought": rsi_overbought,
+        "max_volatility": max_volatility,
+        "signals": int(active.sum()),
+        "hit_rate": float((signed > 0).mean()) if active.any() else float("nan"),
+        "mean_return": float(signed.mean()) if active.any() else float("nan"),
+    }
+
+
+def sweep(data: Dict[str, np.ndarray], grid: Sequence[Sequence[float]], workers: int = None) -> List[Dict[str, float]]:
+    """Evaluate every threshold combination in `grid` across a process pool."""
+    combos = [combo for combo in grid if combo[0] < combo[1]]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_sweep, initargs=(data,)) as pool:
+        return list(pool.map(_evaluate, combos, chunksize=max(1, len(combos) // (4 * (workers or os.cpu_count() or 1)))))
+
+
+def _floats(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item]
+
+
+def _pct(value: float) -> str:
+    return "n/a" if np.isnan(value) else f"{value * 100:.2f}%"
+
+
+def cmd_fetch(args):
+    from market_data import get_history
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    for ticker in args.tickers:
+        history = get_history(ticker, period=args.period)
+        history.to_csv(os.path.join(args.data_dir, f"{ticker}.csv"))
+        print(f"{ticker}: {len(history)} rows")
+
+
+def cmd_run(args):
+    frames = load_history(args.data_dir)
+    data = build_dataset(frames, args.horizon)
+    verdicts = technical_verdicts(data["rsi"], data["volatility"], data["score"],
+                                  args.rsi_oversold, args.rsi_overbought, args.max_volatility)
+
+    print(f"## Verdict backtest: {len(frames)} tickers, {len(verdicts):,} signal days, {args.horizon}-day horizon\n")
+    print("| Verdict | Signals | Hit rate | Mean fwd return | Next-day compounded | Max drawdown |")
+    print("| :--- | ---: | ---: | ---: | ---: | ---: |")
+    for row in rule_metrics(data, verdicts, args.hold_band):
+        print(f"| {row['verdict']} | {row['signals']:,} | {_pct(row['hit_rate'])} | {_pct(row['mean_return'])} "
+              f"| {_pct(row['total_return'])} | {_pct(row['max_drawdown'])} |")
+
+
+def cmd_sweep(args):
+    data = build_dataset(load_history(args.data_dir), args.horizon)
+    grid = itertools.product(_floats(args.rsi_oversold), _floats(args.rsi_overbought), _floats(args.max_volatility))
+    results = sweep(data, list(grid), args.workers)
+    results.sort(key=lambda row: (np.nan_to_num(row["mean_return"], nan=-np.inf), row["signals"]), reverse=True)
+
+    print(f"## Threshold sweep: {len(results)} combinations, {args.horizon}-day horizon, Buy/Sell signals only\n")
+    print("| RSI oversold | RSI overbought | Max volatility | Signals | Hit rate | Mean fwd return |")
+    print("| ---: | ---: | ---: | ---: | ---: | ---: |")
+    for row in results[:args.top]:
+        print(f"| {row['rsi_oversold']:g} | {row['rsi_overbought']:g} | {row['max_volatility']:g} | {row['signals']:,} "
+              f"| {_pct(row['hit_rate'])} | {_pct(row['mean_return'])} |")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fetch = sub.add_parser("fetch", help="download daily history to CSV (needs network)")
+    fetch.add_argument("tickers", nargs="+")
+    fetch.add_argument("--period", default="10y")
+    fetch.add_argument("--data-dir", default="data")
+    fetch.set_defaults(func=cmd_fetch)
+
+    run = sub.add_parser("run", help="per-verdict metrics with the given thresholds")
+    run.add_argument("--rsi-oversold", type=float, default=RSI_OVERSOLD)
+    run.add_argument("--rsi-overbought", type=float, default=RSI_OVERBOUGHT)
+    run.add_argument("--max-volatility", type=float, default=MAX_VOLATILITY)
+    run.add_argument("--hold-band", type=float, default=0.02, help="max |return| for a neutral verdict to count as a hit")
+    run.set_defaults(func=cmd_run)
+
+    grid = sub.add_parser("sweep", help="grid search over RSI and volatility thresholds")
+    grid.add_argument("--rsi-oversold", default="20,25,30,35")
+    grid.add_argument("--rsi-overbought", default="65,70,75,80")
+    grid.add_argument("--max-volatility", default="20,30,40,50,60")
+    grid.add_argument("--workers", type=int, default=None)
+    grid.add_argument("--top", type=int, default=20)
+    grid.set_defaults(func=cmd_sweep)
+
+    for command in (run, grid):
+        command.add_argument("--data-dir", default="data")
+        command.add_argument("--horizon", type=int, default=5, help="forward return horizon in trading days")
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
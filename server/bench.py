@@ -0,0 +1,143 @@
+"""Local benchmarks for the API server.
+
+Usage:
+    python bench.py auth [--logins 50] [--requests 2000]
+    python bench.py imports [--runs 5]
+
+Runs against an in-memory SQLite database and prints a Markdown report.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('DATABASE_URI', 'sqlite://')
+os.environ.setdefault('JWT_SECRET_KEY', 'bench-secret-key-with-enough-length')
+os.environ.setdefault('GEMINI_API_KEY', 'bench')
+
+HASH_METHODS = ["scrypt", "pbkdf2:sha256:600000", "pbkdf2:sha256:100000"]
+
+
+def timed(func, repeat):
+    """Call `func` `repeat` times and return the per-call durations in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def report_row(label, durations):
+    mean = statistics.mean(durations)
+    p95 = sorted(durations)[int(len(durations) * 0.95) - 1]
+    return f"| {label} | {len(durations)} | {mean * 1000:.3f} | {p95 * 1000:.3f} | {1 / mean:,.0f} |"
+
+
+def bench_auth(args):
+    from app import app, db, jwt, UserDetails
+
+    client = app.test_client()
+    print("## Login throughput\n")
+    print("| Hash method | Logins | Mean ms | p95 ms | Logins/s |")
+    print("| :--- | ---: | ---: | ---: | ---: |")
+    for i, method in enumerate(HASH_METHODS):
+        app.config['PASSWORD_HASH_METHOD'] = method
+        user = {"full_name": "Bench", "username": f"bench{i}", "password": "pw", "email": f"bench{i}@example.com"}
+        client.post('/register', json=user)
+        durations = timed(lambda: client.post('/login', json={"username": user["username"], "password": "pw"}), args.logins)
+        print(report_row(method, durations))
+
+    token = client.get_cookie('access_token').value
+    cache = jwt.claims_cache
+
+    print("\n## Per-request auth overhead\n")
+    print("| Path | Calls | Mean ms | p95 ms | Calls/s |")
+    print("| :--- | ---: | ---: | ---: | ---: |")
+    with app.app_context():
+        jwt.claims_cache = None
+        print(report_row("JWT decode (uncached)", timed(lambda: jwt._decode_jwt_from_config(token), args.requests)))
+        jwt.claims_cache = cache
+        print(report_row("JWT decode (cached)", timed(lambda: jwt._decode_jwt_from_config(token), args.requests)))
+        print(report_row("User lookup by username", timed(
+            lambda: UserDetails.query.filter_by(username="bench0").first(), args.requests)))
+        db.session.remove()
+
+    baseline = timed(lambda: client.post('/logout'), args.requests)
+    jwt.claims_cache = None
+    uncached = timed(lambda: client.get('/protected'), args.requests)
+    jwt.claims_cache = cache
+    cached = timed(lambda: client.get('/protected'), args.requests)
+    print(report_row("POST /logout (no auth)", baseline))
+    print(report_row("GET /protected (uncached)", uncached))
+    print(report_row("GET /protected (cached)", cached))
+
+
+def import_app_in_subprocess(extra_env=None):
+    """Import app in a fresh interpreter; return (wall seconds, -X importtime output)."""
+    code = "import time, sys; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    env = {**os.environ, **(extra_env or {})}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True, text=True, env=env, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def bench_imports(args):
+    from startup import HEAVY_MODULES
+
+    walls = []
+    importtime = ""
+    for _ in range(args.runs):
+        wall, importtime = import_app_in_subprocess()
+        walls.append(wall)
+
+    print("## Cold start\n")
+    print("| Measure | Seconds |")
+    print("| :--- | ---: |")
+    print(f"| `import app` (median of {args.runs}) | {statistics.median(walls):.3f} |")
+    print(f"| `import app` (max) | {max(walls):.3f} |")
+
+    # -X importtime lines look like: "import time:   self [us] | cumulative | imported package"
+    rows = []
+    for line in importtime.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match and len(match.group(3)) == 3:  # modules imported directly by app
+            rows.append((int(match.group(2)), match.group(4)))
+    print("\n## Slowest direct imports of `app`\n")
+    print("| Module | Cumulative ms |")
+    print("| :--- | ---: |")
+    for cumulative, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"| {name} | {cumulative / 1000:.1f} |")
+
+    print("\n## Deferred modules (loaded on first use or by PREWARM=1)\n")
+    print("| Module | Incremental seconds |")
+    print("| :--- | ---: |")
+    from startup import preload_modules
+    timings = preload_modules()
+    for name in HEAVY_MODULES:
+        if name in timings:
+            print(f"| {name} | {timings[name]:.3f} |")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    auth = sub.add_parser("auth", help="login throughput and per-request auth overhead")
+    auth.add_argument("--logins", type=int, default=50)
+    auth.add_argument("--requests", type=int, default=2000)
+    auth.set_defaults(func=bench_auth)
+    imports = sub.add_parser("imports", help="cold import time of the server")
+    imports.add_argument("--runs", type=int, default=5)
+    imports.add_argument("--top", type=int, default=10)
+    imports.set_defaults(func=bench_imports)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
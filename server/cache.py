@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries go stale after `ttl` seconds.
+
+    Stale entries are kept until `stale_ttl` so callers can fall back to them
+    when the upstream source is unavailable. `set` can override `ttl` per entry.
+    """
+
+    def __init__(self, ttl: float, stale_ttl: Optional[float] = None, maxsize: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl or ttl, ttl)
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: Hashable) -> Tuple[bool, bool, Any]:
+        """Return (found, fresh, value) for a key."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, False, None
+            value, stored_at, ttl = entry
+            age = time.time() - stored_at
+            if age >= max(self.stale_ttl, ttl):
+                del self._data[key]
+                return False, False, None
+            self._data.move_to_end(key)
+            return True, age < ttl, value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh value, or `default`."""
+        found, fresh, value = self.lookup(key)
+        return value if found and fresh else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time(), self.ttl if ttl is None else ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,9 +1,9 @@
-from googlesearch import search
 import urllib.parse
+from market_data import search_first_result
+
 def get_ticker(comp_name):
     query = f"{comp_name} Yahoo Finance"
-    first_result = next(search(query, num_results=1), None)
+    first_result = search_first_result(query)
     ticker_symbol = first_result.split('/')[4]
     
     return urllib.parse.unquote(ticker_symbol)
-
@@ -0,0 +1,16 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Shared pool for the blocking network calls made from async views
+io_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('IO_WORKERS', '64')),
+    thread_name_prefix='io'
+)
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking call on the shared I/O pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, partial(func, *args, **kwargs))
@@ -0,0 +1,159 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class JobLimitExceeded(Exception):
+    """Raised when a user already has the maximum number of active jobs."""
+
+
+class Job:
+    """A unit of work submitted to the JobQueue."""
+
+    def __init__(self, kind: str, params: Dict[str, Any], key: str, priority: int, user_id: int):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.priority = priority
+        self.owners = {user_id}
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"job_id": self.id, "kind": self.kind, "status": self.status}
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """In-process priority queue with a worker pool.
+
+    Identical jobs (same kind and params) that are still queued or running are
+    shared instead of executed twice. Finished jobs are kept for `retention`
+    seconds so clients can poll for the result.
+    """
+
+    def __init__(self, workers: int = 4, per_user_limit: int = 3, retention: int = 3600):
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.retention = retention
+        self._handlers: Dict[str, Callable[..., Any]] = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._jobs: Dict[str, Job] = {}
+        self._inflight: Dict[str, Job] = {}
+        self._cv = threading.Condition()
+        self._threads = []
+
+    def register(self, kind: str, handler: Callable[..., Any]) -> None:
+        """Register the function that runs jobs of the given kind."""
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, params: Dict[str, Any], user_id: int, priority: str = "normal") -> Job:
+        """Queue a job, or attach the user to an identical in-flight job."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if not isinstance(priority, str) or priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        key = f"{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+
+        with self._cv:
+            self._expire()
+            job = self._inflight.get(key)
+            if job and user_id not in job.owners:
+                if self._active_count(user_id) >= self.per_user_limit:
+                    raise JobLimitExceeded(f"At most {self.per_user_limit} active jobs allowed per user")
+                job.owners.add(user_id)
+            if job:
+                self._promote(job, PRIORITIES[priority])
+                return job
+            if self._active_count(user_id) >= self.per_user_limit:
+                raise JobLimitExceeded(f"At most {self.per_user_limit} active jobs allowed per user")
+
+            job = Job(kind, params, key, PRIORITIES[priority], user_id)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            heapq.heappush(self._heap, (job.priority, next(self._counter), job))
+            self._ensure_workers()
+            self._cv.notify()
+        return job
+
+    def get(self, job_id: str, user_id: int) -> Optional[Job]:
+        """Return a job if it exists and belongs to the user."""
+        with self._cv:
+            self._expire()
+            job = self._jobs.get(job_id)
+        if job is None or user_id not in job.owners:
+            return None
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        with self._cv:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def _promote(self, job: Job, priority: int) -> None:
+        """Re-queue a waiting job at a higher priority; the old heap entry is skipped when popped."""
+        if job.status == "queued" and priority < job.priority:
+            job.priority = priority
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+
+    def _active_count(self, user_id: int) -> int:
+        return sum(1 for job in self._inflight.values() if user_id in job.owners)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _ensure_workers(self) -> None:
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self) -> None:
+        while True:
+            with self._cv:
+                while not self._heap:
+                    self._cv.wait()
+                priority, _, job = heapq.heappop(self._heap)
+                if job.status != "queued" or priority != job.priority:
+                    continue  # Stale entry left behind by _promote
+                job.status = "running"
+
+            try:
+                result = self._handlers[job.kind](**job.params)
+                status, error = "done", None
+            except Exception as e:
+                traceback.print_exc()
+                result, status, error = None, "failed", str(e)
+
+            with self._cv:
+                job.result = result
+                job.error = error
+                job.status = status
+                job.finished_at = time.time()
+                self._inflight.pop(job.key, None)
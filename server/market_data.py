@@ -0,0 +1,89 @@
+import os
+
+# yfinance, feedparser, googlesearch and requests are imported on first use to keep startup fast
+from money import to_paise
+from upstream import budget, RateLimited
+
+HISTORY_TTL = int(os.getenv('HISTORY_CACHE_TTL', '900'))
+
+
+class CurrencyConversionError(ValueError):
+    """Raised when Frankfurter does not return an INR rate."""
+
+    def __init__(self, details):
+        super().__init__("Currency conversion failed")
+        self.details = details
+
+
+def _get(url: str):
+    """GET a URL, raising for 429 and 5xx so error bodies are never cached as data."""
+    import requests
+    response = requests.get(url)
+    if response.status_code == 429:
+        raise RateLimited(url)
+    if response.status_code >= 500:
+        raise requests.HTTPError(f"{response.status_code} from {url}", response=response)
+    return response
+
+
+def search_first_result(query: str) -> str:
+    """Return the first Google search result URL for a query."""
+    from googlesearch import search
+    return budget.call('google_search', lambda: next(search(query, num_results=1), None), cache_key=query)
+
+
+def get_info(symbol: str) -> dict:
+    """Fetch the Yahoo Finance info dict for a ticker."""
+    import yfinance as yf
+    return budget.call('yahoo', lambda: yf.Ticker(symbol).info, cache_key=('info', symbol))
+
+
+def get_history(symbol: str, period: str = "2mo"):
+    """Fetch daily price history for a ticker as a DataFrame."""
+    import yfinance as yf
+    # Daily bars change slowly, so history stays fresh longer than quotes
+    return budget.call('yahoo', lambda: yf.Ticker(symbol).history(period=period), cache_key=('history', symbol, period),
+                       ttl=HISTORY_TTL)
+
+
+def get_inr_rate(currency: str) -> dict:
+    """Fetch the Frankfurter response for converting one unit of `currency` to INR."""
+    def fetch():
+        fx_data = _get(f"https://api.frankfurter.app/latest?from={currency}&to=INR").json()
+        if 'rates' not in fx_data:
+            raise CurrencyConversionError(fx_data)
+        return fx_data
+    return budget.call('frankfurter', fetch, cache_key=currency)
+
+
+def to_inr_paise(amount, currency: str) -> int:
+    """Convert an amount in `currency` to INR paise using Frankfurter."""
+    if currency == "INR":
+        return to_paise(amount)
+    fx_data = get_inr_rate(currency)
+    return to_paise(amount, fx_data['rates']['INR'])
+
+
+def get_current_price_paise(symbol: str) -> int:
+    """Fetch the current price of a ticker in INR paise."""
+    info = get_info(symbol)
+    return to_inr_paise(info['currentPrice'], info['currency'])
+
+
+def get_page(url: str) -> str:
+    """Fetch a moneycontrol page and return its HTML."""
+    return budget.call('moneycontrol', lambda: _get(url).text, cache_key=url)
+
+
+def get_news_feed(url: str):
+    """Fetch and parse a Google News RSS feed."""
+    def fetch():
+        import feedparser
+        feed = feedparser.parse(url)
+        status = feed.get('status', 200)
+        if status == 429:
+            raise RateLimited(url)
+        if status >= 500:
+            raise ConnectionError(f"{status} from {url}")
+        return feed
+    return budget.call('google_news', fetch, cache_key=url)
@@ -0,0 +1,38 @@
+"""One-off migration: user_stocks.purchase_price (float rupees) -> purchase_price_paise (integer paise).
+
+Usage: python migrate_money.py
+"""
+from sqlalchemy import inspect, text
+
+from app import app, db, init_db
+from money import to_paise
+
+
+def migrate():
+    init_db()
+    with app.app_context():
+        columns = {column['name'] for column in inspect(db.engine).get_columns('user_stocks')}
+        if 'purchase_price' not in columns:
+            print("user_stocks already uses purchase_price_paise, nothing to do")
+            return
+
+        with db.engine.begin() as conn:
+            if 'purchase_price_paise' not in columns:
+                conn.execute(text("ALTER TABLE user_stocks ADD COLUMN purchase_price_paise BIGINT"))
+
+            rows = conn.execute(text("SELECT id, purchase_price FROM user_stocks")).all()
+            if rows:
+                conn.execute(
+                    text("UPDATE user_stocks SET purchase_price_paise = :paise WHERE id = :id"),
+                    [{"id": row.id, "paise": to_paise(row.purchase_price)} for row in rows]
+                )
+
+            conn.execute(text("ALTER TABLE user_stocks DROP COLUMN purchase_price"))
+            if conn.dialect.name != 'sqlite':  # SQLite cannot add NOT NULL to an existing column
+                conn.execute(text("ALTER TABLE user_stocks ALTER COLUMN purchase_price_paise SET NOT NULL"))
+
+        print(f"Converted {len(rows)} rows to paise")
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,39 @@
+"""Fixed-point money helpers.
+
+INR amounts are held as integer paise (1/100 rupee) everywhere between the
+upstream quote and the JSON response, so no precision is lost to floats or
+to a narrow Decimal context.
+"""
+from decimal import Decimal, ROUND_HALF_UP, Context
+from typing import Dict, Iterable
+
+# Local context so the thread-local default (or anyone changing it) cannot truncate amounts
+_CONTEXT = Context(prec=34, rounding=ROUND_HALF_UP)
+_ONE = Decimal(1)
+
+
+def to_paise(amount, rate=None) -> int:
+    """Convert a rupee amount (float, str, int or Decimal) to paise, optionally multiplying by an FX rate."""
+    value = _CONTEXT.create_decimal(str(amount))
+    if rate is not None:
+        value = _CONTEXT.multiply(value, _CONTEXT.create_decimal(str(rate)))
+    return int(_CONTEXT.scaleb(value, 2).quantize(_ONE, context=_CONTEXT))
+
+
+def from_paise(paise: int) -> float:
+    """Convert paise to rupees for JSON responses."""
+    return paise / 100
+
+
+def within_basis_points(old: int, new: int, basis_points: int) -> bool:
+    """True when `new` differs from `old` by at most `basis_points` (1 bp = 0.01%) of `old`."""
+    return abs(old - new) * 10000 <= old * basis_points
+
+
+def portfolio_totals(quantities: Iterable[int], purchase_paise: Iterable[int], current_paise: Iterable[int]) -> Dict[str, int]:
+    """Sum invested value, current value and P&L in paise with int64 arithmetic."""
+    import numpy as np
+    quantities = np.fromiter(quantities, dtype=np.int64)
+    invested = int(np.dot(quantities, np.fromiter(purchase_paise, dtype=np.int64)))
+    current = int(np.dot(quantities, np.fromiter(current_paise, dtype=np.int64)))
+    return {"invested": invested, "current": current, "pnl": current - invested}
@@ -0,0 +1,162 @@
+"""Fast JSON responses and HTTP compression.
+
+Routes returning large payloads use `json_response` instead of `jsonify`. It
+honours three optional query parameters:
+
+    fields=a,b.c     keep only these (dotted) paths
+    exclude=b.c.d    drop these (dotted) paths, e.g. exclude=raw_data.stock_data.history
+    format=columnar  turn lists of records into one array per field
+
+`compress_response` is registered as an after_request hook and gzip/brotli
+encodes large text responses based on Accept-Encoding.
+"""
+import dataclasses
+import decimal
+import gzip
+import json
+import math
+import os
+import uuid
+from datetime import date
+from typing import Any, Dict, List
+
+from flask import Response, current_app, request
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', '5'))
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+
+def _default(obj: Any) -> Any:
+    """Encode the same extra types as Flask's JSON provider."""
+    if isinstance(obj, date):
+        return http_date(obj)
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, 'item'):  # numpy and pandas scalars
+        value = obj.item()
+        return None if isinstance(value, float) and not math.isfinite(value) else value
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj: Any) -> Any:
+    """Replace NaN and infinities with None, as orjson does."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, using orjson when it is installed.
+
+    Non-finite floats become null on both paths, so the output is always valid JSON.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=(
+            orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ))
+    options = dict(default=_default, separators=(',', ':'), ensure_ascii=False, allow_nan=False)
+    try:
+        return json.dumps(payload, **options).encode()
+    except ValueError:
+        # Only pay for the extra pass when the payload actually holds NaN or infinity
+        return json.dumps(_finite(payload), **options).encode()
+
+
+def _split_paths(value: str) -> List[List[str]]:
+    return [path.strip().split('.') for path in value.split(',') if path.strip()]
+
+
+def _include(obj: Any, paths: List[List[str]]) -> Any:
+    if isinstance(obj, list):
+        return [_include(item, paths) for item in obj]
+    if not isinstance(obj, dict) or any(not path for path in paths):
+        return obj
+    grouped: Dict[str, List[List[str]]] = {}
+    for head, *rest in paths:
+        grouped.setdefault(head, []).append(rest)
+    return {key: _include(obj[key], rest) for key, rest in grouped.items() if key in obj}
+
+
+def _exclude(obj: Any, paths: List[List[str]]) -> Any:
+    if isinstance(obj, list):
+        return [_exclude(item, paths) for item in obj]
+    if not isinstance(obj, dict):
+        return obj
+    dropped = {path[0] for path in paths if len(path) == 1}
+    nested: Dict[str, List[List[str]]] = {}
+    for head, *rest in paths:
+        if rest:
+            nested.setdefault(head, []).append(rest)
+    return {key: _exclude(value, nested[key]) if key in nested else value
+            for key, value in obj.items() if key not in dropped}
+
+
+def to_columnar(obj: Any) -> Any:
+    """Recursively turn lists of dicts into dicts of equal-length lists."""
+    if isinstance(obj, dict):
+        return {key: to_columnar(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        if obj and all(isinstance(item, dict) for item in obj):
+            columns: Dict[Any, None] = {}
+            for item in obj:
+                columns.update(dict.fromkeys(item))
+            return {column: [to_columnar(item.get(column)) for item in obj] for column in columns}
+        return [to_columnar(item) for item in obj]
+    return obj
+
+
+def json_response(payload: Any, status: int = 200) -> Response:
+    """Build a JSON response, applying the fields/exclude/format query parameters."""
+    if request.args.get('fields'):
+        payload = _include(payload, _split_paths(request.args['fields']))
+    if request.args.get('exclude'):
+        payload = _exclude(payload, _split_paths(request.args['exclude']))
+    if request.args.get('format') == 'columnar':
+        payload = to_columnar(payload)
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+def compress_response(response: Response) -> Response:
+    """Compress large text responses with brotli or gzip when the client accepts it."""
+    if (response.direct_passthrough
+            or not 200 <= response.status_code < 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality('br') > 0:
+        data, encoding = brotli.compress(data, quality=COMPRESS_LEVEL), 'br'
+    elif accepted.quality('gzip') > 0:
+        data, encoding = gzip.compress(data, compresslevel=COMPRESS_LEVEL), 'gzip'
+    else:
+        return response
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+    return response
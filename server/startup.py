@@ -0,0 +1,66 @@
+"""Cold-start helpers.
+
+Heavy optional dependencies are imported inside the functions that use them,
+so `import app` stays cheap. Setting PREWARM=1 loads them (and initializes the
+database and Gemini client) on a background thread right after startup, so the
+first request that needs them does not pay the cost.
+"""
+import importlib
+import os
+import threading
+import time
+import traceback
+
+# Modules deferred until first use, in rough order of import cost
+HEAVY_MODULES = [
+    "pandas",
+    "yfinance",
+    "google.genai",
+    "numpy",
+    "bs4",
+    "ollama",
+    "feedparser",
+    "googlesearch",
+    "requests",
+]
+
+
+def preload_modules():
+    """Import the deferred modules and return the seconds spent on each."""
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            traceback.print_exc()
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def prewarm(init_db=None, background=True):
+    """Load heavy modules and run `init_db`, on a daemon thread unless `background` is False."""
+    def run():
+        preload_modules()
+        if init_db is not None:
+            try:
+                init_db()
+            except Exception:
+                traceback.print_exc()
+        from api import get_client
+        try:
+            get_client()
+        except Exception:
+            traceback.print_exc()
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+def prewarm_enabled():
+    return os.getenv('PREWARM', '').lower() in ('1', 'true', 'yes')
@@ -1,11 +1,66 @@
-import pandas as pd
-import yfinance as yf
-import feedparser
-from googlesearch import search
+import os
 import urllib.parse
 from flask import jsonify, request
-
-def analyze_stock(comp_name, data=None):
+from cache import TTLCache
+from market_data import search_first_result, get_info, get_history, get_news_feed
+
+# Recent analysis results keyed by ticker, filled by requests and the cache warmer
+snapshot_cache = TTLCache(ttl=int(os.getenv('ANALYSIS_CACHE_TTL', '900')))
+
+NEWS_UNAVAILABLE = ["Unable to fetch news headlines."]
+
+def get_google_news_headlines(query):
+    try:
+        query = query.replace(' ', '+')
+        url = f"https://news.google.com/rss/search?q={query}"
+        feed = get_news_feed(url)
+        news = []
+        for entry in feed.entries[:15]:  # Limit to top 5 headlines
+            title = entry.title
+            published = entry.published
+            news.append(f"📰 {title}\n📅 {published}\n")
+        # url = f"https://news.google.com/rss/search?q=global Stock Market News {query}"
+        # feed = feedparser.parse(url)
+        # global_news = []
+        # for entry in feed.entries[:15]:  # Limit to top 5 headlines
+        #     title = entry.title
+        #     published = entry.published
+        #     news.append(f"📰 {title}\n📅 {published}\n")
+        return news
+    except Exception:
+        return NEWS_UNAVAILABLE
+
+# Thresholds for generate_technical_verdict; backtest.py replays and sweeps them
+RSI_OVERSOLD = 30
+RSI_OVERBOUGHT = 70
+MAX_VOLATILITY = 30
+BULLISH_SCORE = 4
+BEARISH_SCORE = 1
+
+def generate_technical_verdict(sma_5, sma_10, rsi, macd, signal, momentum, price_trend, volume_trend, volatility,
+                               rsi_oversold=RSI_OVERSOLD, rsi_overbought=RSI_OVERBOUGHT, max_volatility=MAX_VOLATILITY):
+    score = 0
+    if rsi > 50: score += 1
+    if macd > signal: score += 1
+    if momentum > 0: score += 1
+    if volume_trend == "Increasing": score += 1
+    if sma_5 > sma_10: score += 1
+    if price_trend > 0: score += 1
+
+    if rsi < rsi_oversold:
+        return "Buy - Oversold"
+    elif rsi > rsi_overbought:
+        return "Sell - Overbought"
+    elif volatility > max_volatility:
+        return "Caution - High Volatility"
+    elif score >= BULLISH_SCORE:
+        return "Buy - Strong Bullish Indicators"
+    elif score <= BEARISH_SCORE:
+        return "Sell - Strong Bearish Indicators"
+    else:
+        return "Hold - Mixed Signals"
+
+def analyze_stock(comp_name, data=None, include_news=True):
     """
     Fetches stock data using yfinance, performs technical and fundamental analysis,
     and retrieves news headlines for a given company.
@@ -13,24 +68,34 @@ def analyze_stock(comp_name, data=None):
     Args:
         comp_name (str): Name of the company.
         data (dict, optional): Pre-fetched stock data. If None, data is fetched from yfinance.
+        include_news (bool): Fetch news headlines for `comp_name`. The cache warmer skips them.
 
     Returns:
         dict: Combined stock data and analysis results.
     """
+    result = dict(_analyze_ticker(comp_name, data))
+    result["news_headlines"] = get_google_news_headlines(f"{comp_name} Stocks latest info") if include_news else []
+    return result
+
+def _analyze_ticker(comp_name, data=None):
+    """Everything in analyze_stock that depends only on the resolved ticker; cached per ticker."""
     # ----------- Fetch Stock Data -----------
+    ticker_symbol = None
     if data is None:
-        ticker_symbol = None
         try:
             # Search for ticker symbol via Yahoo Finance
             query = f"Yahoo Finance {comp_name}"
-            first_result = next(search(query, num_results=1))
+            first_result = search_first_result(query)
             ticker_symbol = first_result.split('/')[4]
             ticker_symbol = urllib.parse.unquote(ticker_symbol)  # Decode URL-encoded ticker symbol
-            stock = yf.Ticker(ticker_symbol)
+
+            snapshot = snapshot_cache.get(ticker_symbol)  # Ticker-derived data only, no news
+            if snapshot is not None:
+                return snapshot
 
             # Fetch stock info and history
-            info = stock.info
-            history = stock.history(period="2mo")
+            info = get_info(ticker_symbol)
+            history = get_history(ticker_symbol, period="2mo")
             currency = info.get('currency', 'USD')
 
             if history.empty or len(history) < 20:
@@ -53,6 +118,8 @@ def analyze_stock(comp_name, data=None):
             raise ValueError(f"Error fetching data for {comp_name}: {str(e)}")
 
     # ----------- Prepare DataFrames -----------
+    import pandas as pd  # Deferred so importing this module stays cheap
+
     df = pd.DataFrame(data['history'])[['Date', 'Close', 'Volume']]
     df['Date'] = pd.to_datetime(df['Date'])
     df.sort_values('Date', inplace=True)
@@ -90,28 +157,6 @@ def analyze_stock(comp_name, data=None):
     daily_returns = df['Close'].pct_change()
     volatility = daily_returns.std() * 100 * (252 ** 0.5)
 
-    def generate_technical_verdict(sma_5, sma_10, rsi, macd, signal, momentum, price_trend, volume_trend, volatility):
-        score = 0
-        if rsi > 50: score += 1
-        if macd > signal: score += 1
-        if momentum > 0: score += 1
-        if volume_trend == "Increasing": score += 1
-        if sma_5 > sma_10: score += 1
-        if price_trend > 0: score += 1
-
-        if rsi < 30:
-            return "Buy - Oversold"
-        elif rsi > 70:
-            return "Sell - Overbought"
-        elif volatility > 30:
-            return "Caution - High Volatility"
-        elif score >= 4:
-            return "Buy - Strong Bullish Indicators"
-        elif score <= 1:
-            return "Sell - Strong Bearish Indicators"
-        else:
-            return "Hold - Mixed Signals"
-
     technical_verdict = generate_technical_verdict(
         sma_5, sma_10, rsi, macd_value, signal_value, momentum, price_trend, volume_trend, volatility
     )
@@ -150,32 +195,8 @@ def analyze_stock(comp_name, data=None):
         eps, revenue_growth, pe_ratio, de_ratio, roe, div_yield
     )
 
-    # ----------- News Headlines -----------
-    def get_google_news_headlines(query):
-        try:
-            query = query.replace(' ', '+')
-            url = f"https://news.google.com/rss/search?q={query}"
-            feed = feedparser.parse(url)
-            news = []
-            for entry in feed.entries[:15]:  # Limit to top 5 headlines
-                title = entry.title
-                published = entry.published
-                news.append(f"📰 {title}\n📅 {published}\n")
-            # url = f"https://news.google.com/rss/search?q=global Stock Market News {query}"
-            # feed = feedparser.parse(url)
-            # global_news = []
-            # for entry in feed.entries[:15]:  # Limit to top 5 headlines
-            #     title = entry.title
-            #     published = entry.published
-            #     news.append(f"📰 {title}\n📅 {published}\n")
-            return news
-        except Exception:
-            return ["Unable to fetch news headlines."]
-
-    news = get_google_news_headlines(f"{comp_name} Stocks latest info")
-
     # ----------- Return Combined Results -----------
-    return {
+    result = {
         "stock_name": ticker_symbol if ticker_symbol else comp_name,
         "stock_data": data,
         "currency": currency,
@@ -201,5 +222,8 @@ def analyze_stock(comp_name, data=None):
             "roe": roe if roe is not None else 'N/A',
             "div_yield": div_yield if div_yield is not None else 'N/A'
         },
-        "news_headlines": news
-    }
\ No newline at end of file
+    }
+
+    if ticker_symbol:
+        snapshot_cache.set(ticker_symbol, result)
+    return result
\ No newline at end of file
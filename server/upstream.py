@@ -0,0 +1,278 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from cache import TTLCache
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when a provider is out of budget or its circuit is open and nothing is cached."""
+
+
+class RateLimited(Exception):
+    """Raised by fetchers when a provider answers with HTTP 429."""
+
+
+def is_rate_limited(e: Exception) -> bool:
+    """Detect 429 responses across requests, yfinance and googlesearch errors."""
+    if isinstance(e, RateLimited):
+        return True
+    response = getattr(e, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    return 'RateLimit' in type(e).__name__ or 'Too Many Requests' in str(e)
+
+
+def is_upstream_failure(e: Exception) -> bool:
+    """True for 429s, 5xx responses and transport errors; False for bad input such as an unknown ticker."""
+    if is_rate_limited(e):
+        return True
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    if status is not None:
+        return status >= 500
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    # HTTP clients are imported lazily (see startup.py), so match their errors by module
+    return any(cls.__module__.split('.')[0] in ('requests', 'urllib3', 'curl_cffi') for cls in type(e).__mro__)
+
+
+class TokenBucket:
+    """Token bucket whose refill rate halves on 429s and recovers on success."""
+
+    def __init__(self, rate: float, capacity: float, min_rate: Optional[float] = None):
+        self.base_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.capacity = capacity
+        self.tokens = capacity
+        self.cooldown_until = 0.0
+        self._backoffs = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float = 0.0) -> bool:
+        """Take one token, waiting at most `timeout` seconds for it."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.cooldown_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = max(self.cooldown_until - now, (1 - self.tokens) / self.rate)
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def acquire_above(self, reserve: float) -> bool:
+        """Take one token without waiting, only if `reserve` tokens would still be left."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.cooldown_until and self.tokens >= reserve + 1:
+                self.tokens -= 1
+                return True
+            return False
+
+    def refund(self) -> None:
+        """Return a token that was taken but not used."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def backoff(self) -> None:
+        """Slow down after a 429: halve the rate and pause with exponential delay."""
+        with self._lock:
+            self._backoffs += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.cooldown_until = time.monotonic() + min(2 ** self._backoffs, 300)
+            self.tokens = 0
+
+    def recover(self) -> None:
+        """Step the rate back towards its configured value after a success."""
+        with self._lock:
+            self._backoffs = 0
+            self.rate = min(self.base_rate, self.rate + self.base_rate / 10)
+
+    def remaining(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one trial call through after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def ready(self) -> bool:
+        """True when a call could go through: closed, or open long enough for a trial."""
+        with self._lock:
+            return self.state == "closed" or (
+                self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout)
+
+    def begin(self) -> bool:
+        """Claim permission for a call that already holds a token.
+
+        Moves an expired open breaker to half_open for a single trial. The caller
+        must then report the outcome with record_success or record_failure.
+        """
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                return True
+            return self.state == "closed"
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class Provider:
+    """Budget, breaker and cache for one upstream data source."""
+
+    def __init__(self, name: str, rate: float, burst: float, ttl: float, stale_ttl: float, max_wait: float = 5.0):
+        prefix = f"UPSTREAM_{name.upper()}_"
+        self.name = name
+        self.max_wait = float(os.getenv(prefix + 'MAX_WAIT', max_wait))
+        self.bucket = TokenBucket(float(os.getenv(prefix + 'RATE', rate)), float(os.getenv(prefix + 'BURST', burst)))
+        self.breaker = CircuitBreaker()
+        self.cache = TTLCache(ttl, stale_ttl)
+        self.counters = {"calls": 0, "cache_hits": 0, "stale_served": 0, "rejected": 0, "failures": 0, "rate_limited": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _counters_snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "tokens_remaining": round(self.bucket.remaining(), 2),
+            "capacity": self.bucket.capacity,
+            "rate_per_sec": round(self.bucket.rate, 4),
+            "cooldown_seconds": round(max(0.0, self.bucket.cooldown_until - time.monotonic()), 1),
+            "breaker": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "cached_entries": len(self.cache),
+            **self._counters_snapshot(),
+        }
+
+
+class UpstreamBudget:
+    """Central gate for all third-party calls.
+
+    Fresh cache hits never touch the network. Otherwise a call needs a token
+    and a closed breaker; when either is missing, a stale cached value is
+    served instead of waiting.
+    """
+
+    def __init__(self, providers: Dict[str, Provider]):
+        self.providers = providers
+        self._local = threading.local()
+
+    @contextmanager
+    def reserving(self, reserve: float):
+        """Within this block, calls on the current thread never wait and never dip below `reserve` tokens.
+
+        Background work such as the cache warmer uses this to leave budget for user requests.
+        """
+        previous = getattr(self._local, 'reserve', None)
+        self._local.reserve = reserve
+        try:
+            yield
+        finally:
+            self._local.reserve = previous
+
+    def _acquire(self, p: Provider, found: bool) -> bool:
+        reserve = getattr(self._local, 'reserve', None)
+        if reserve is not None:
+            return p.bucket.acquire_above(reserve)
+        return p.bucket.acquire(0 if found else p.max_wait)
+
+    def call(self, provider: str, func: Callable[..., Any], *args, cache_key: Optional[Hashable] = None,
+             ttl: Optional[float] = None, **kwargs) -> Any:
+        p = self.providers[provider]
+        found, fresh, cached = p.cache.lookup(cache_key) if cache_key is not None else (False, False, None)
+        if fresh:
+            p.count("cache_hits")
+            return cached
+
+        allowed = p.breaker.ready() and self._acquire(p, found)
+        # Only claim the breaker (and a half-open trial) once a token is in hand
+        if allowed and not p.breaker.begin():
+            p.bucket.refund()
+            allowed = False
+        if not allowed:
+            if found:
+                p.count("stale_served")
+                return cached
+            p.count("rejected")
+            raise UpstreamUnavailable(f"{provider} is temporarily unavailable (rate limit or circuit open)")
+
+        p.count("calls")
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if not is_upstream_failure(e):
+                # The provider answered; the request itself was bad (e.g. unknown ticker)
+                p.breaker.record_success()
+                raise
+            p.count("failures")
+            if is_rate_limited(e):
+                p.count("rate_limited")
+                p.bucket.backoff()
+            p.breaker.record_failure()
+            if found:
+                p.count("stale_served")
+                return cached
+            raise
+
+        p.breaker.record_success()
+        p.bucket.recover()
+        if cache_key is not None:
+            p.cache.set(cache_key, result, ttl)
+        return result
+
+    def has_headroom(self, provider: str, reserve: float, calls: int = 1) -> bool:
+        """True when the provider can currently spare `calls` calls while keeping `reserve` tokens.
+
+        This is only a hint; use `reserving` to enforce the reserve atomically.
+        """
+        p = self.providers[provider]
+        return p.breaker.state == "closed" and p.bucket.remaining() >= reserve + calls
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: p.metrics() for name, p in self.providers.items()}
+
+
+budget = UpstreamBudget({
+    "google_search": Provider("google_search", rate=0.2, burst=3, ttl=86400, stale_ttl=7 * 86400, max_wait=10),
+    "yahoo": Provider("yahoo", rate=2, burst=10, ttl=60, stale_ttl=86400),
+    "frankfurter": Provider("frankfurter", rate=2, burst=5, ttl=300, stale_ttl=86400),
+    "moneycontrol": Provider("moneycontrol", rate=0.5, burst=2, ttl=60, stale_ttl=3600),
+    "google_news": Provider("google_news", rate=1, burst=3, ttl=600, stale_ttl=86400),
+})
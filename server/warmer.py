@@ -0,0 +1,160 @@
+"""Pre-fetch market data for held and frequently predicted tickers.
+
+Around each NSE and US session open and close, the warmer loads quotes,
+price history and analysis snapshots into the caches, so the first portfolio
+or prediction request after the bell is served from warm data. It only
+spends upstream budget while a provider keeps `reserve` tokens for user
+traffic.
+
+Run it in exactly one process: either start it from the serving entry point
+(asgi.py with CACHE_WARMER=1 and a single worker) or run `python warmer.py`
+next to a multi-worker server.
+"""
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, time as clock
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from market_data import get_info, get_history
+from stock_analysis import analyze_stock
+from upstream import budget, UpstreamUnavailable
+
+
+@dataclass(frozen=True)
+class Session:
+    name: str
+    timezone: str
+    open: clock
+    close: clock
+    matches: Callable[[str], bool]
+
+
+SESSIONS = [
+    Session("NSE", "Asia/Kolkata", clock(9, 15), clock(15, 30),
+            lambda symbol: symbol.upper().endswith((".NS", ".BO"))),
+    Session("US", "America/New_York", clock(9, 30), clock(16, 0),
+            lambda symbol: "." not in symbol),
+]
+
+
+def warm_windows(now: datetime, lead: float, window: float, days: int = 7) -> List[Tuple[datetime, datetime, Session]]:
+    """Warm-up windows around each weekday open and close, starting `lead` seconds before the bell."""
+    windows = []
+    for session in SESSIONS:
+        tz = ZoneInfo(session.timezone)
+        today = now.astimezone(tz).date()
+        for offset in range(-1, days):
+            day = today + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            for bell in (session.open, session.close):
+                at = datetime.combine(day, bell, tz)
+                start, end = at - timedelta(seconds=lead), at + timedelta(seconds=window)
+                if end > now:
+                    windows.append((start, end, session))
+    return sorted(windows, key=lambda w: w[0])
+
+
+class CacheWarmer:
+    """Background scheduler that warms caches for the symbols returned by `load_symbols`."""
+
+    def __init__(self, load_symbols: Callable[[], Iterable[str]], concurrency: int = 4,
+                 reserve: float = 2, lead: float = 300, window: float = 1800, interval: float = 300,
+                 setup: Optional[Callable[[], None]] = None):
+        self.load_symbols = load_symbols
+        self.setup = setup
+        self.concurrency = concurrency
+        self.reserve = reserve
+        self.lead = lead
+        self.window = window
+        self.interval = interval
+        self.last_run: Dict[str, object] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def warm_symbol(self, symbol: str) -> str:
+        """Fetch quote, history and analysis snapshot for one ticker, if budget allows.
+
+        Returns "warmed", "partial" (quote and history only) or "skipped". News is
+        left out of the snapshot since it depends on the name the user searches for.
+        """
+        with budget.reserving(self.reserve):
+            if not budget.has_headroom('yahoo', self.reserve, calls=2):
+                return "skipped"
+            try:
+                get_info(symbol)
+                get_history(symbol, period="2mo")
+            except UpstreamUnavailable:
+                return "skipped"
+
+            if not budget.has_headroom('google_search', self.reserve):
+                return "partial"
+            try:
+                analyze_stock(symbol, include_news=False)
+            except Exception as e:
+                # analyze_stock wraps fetch errors in ValueError, so look at the cause too
+                if isinstance(e, UpstreamUnavailable) or isinstance(e.__context__, UpstreamUnavailable):
+                    return "partial"
+                raise
+            return "warmed"
+
+    def run_once(self, session: Optional[Session] = None) -> Dict[str, int]:
+        """Warm every target symbol (of one session, if given) and return outcome counts."""
+        symbols = [s for s in self.load_symbols() if session is None or session.matches(s)]
+        counts = {"warmed": 0, "partial": 0, "skipped": 0, "failed": 0}
+
+        def warm(symbol):
+            try:
+                return self.warm_symbol(symbol)
+            except Exception:
+                traceback.print_exc()
+                return "failed"
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="warm") as pool:
+            for outcome in pool.map(warm, symbols):
+                counts[outcome] += 1
+
+        self.last_run = {"session": session.name if session else "all", "at": time.time(), **counts}
+        print(f"Cache warmer ({self.last_run['session']}): {counts}")
+        return counts
+
+    def run(self) -> None:
+        """Run `setup` once, then warm every session window until stopped."""
+        if self.setup is not None:
+            try:
+                self.setup()
+            except Exception:
+                traceback.print_exc()
+        while not self._stop.is_set():
+            now = datetime.now(ZoneInfo("UTC"))
+            windows = warm_windows(now, self.lead, self.window)
+            active = [w for w in windows if w[0] <= now]
+            if active:
+                for session in dict.fromkeys(w[2] for w in active):
+                    self.run_once(session)
+                delay = self.interval
+            else:
+                delay = min((windows[0][0] - now).total_seconds(), 3600)
+            self._stop.wait(max(delay, 1))
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="cache-warmer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def warmer_enabled():
+    return os.getenv('CACHE_WARMER', '').lower() in ('1', 'true', 'yes')
+
+
+if __name__ == '__main__':
+    from app import cache_warmer
+    cache_warmer.run()